@@ -1,12 +1,23 @@
 import streamlit as st
+from streamlit.runtime.uploaded_file_manager import UploadedFile
 import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import io
+import hashlib
+import tempfile
+import time
+from pathlib import Path
 from typing import Any, Tuple
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor
 
 from mailchimp_marketing import Client
 from mailchimp_marketing.api_client import ApiClientError
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import base64
-import json
 
 from lead_tagger import BaseTagger, StandardTagger, Custom_1_Tagger
 
@@ -15,7 +26,15 @@ from streamlit_sortables import sort_items
 
 
 # -- Constants --
-default_columns = [
+MAILCHIMP_BATCH_SIZE = 500 # max members per batch subscribe (POST /lists/{list_id}) call
+MAILCHIMP_MAX_WORKERS = 8 # stay under Mailchimp's 10 simultaneous connections per account
+MAILCHIMP_TIMEOUT = (10, 120) # (connect, read) seconds per batch request, so a stalled connection can't hang the send
+PREVIEW_ROWS = 200 # rows rendered in the browser, downloads always contain every row
+CACHE_DIR = Path(__file__).parent / "cache" # normalized uploads, persisted across sessions and restarts
+CACHE_VERSION = 2 # bump whenever normalize_emails' output changes, so old-shape cache files are never served
+CACHE_MAX_AGE = 24 * 60 * 60 # seconds a normalized upload (lead PII) is kept, in memory and on disk
+
+DEFAULT_COLUMNS = frozenset([
     'first_name',
     'last_name',
     'email_1',
@@ -93,17 +112,57 @@ default_columns = [
     'md5',
     'insight',
     'email' # added for normalization
+])
+
+# low-cardinality columns stored as categoricals after load
+CATEGORICAL_COLUMNS = [
+    'state',
+    'county_name',
+    'gender',
+    'address_type',
+    'prop_type',
+    'credit_range',
+    'household_income',
+    'household_net_worth',
+    'home_owner_status',
+    'marital_status',
+    'occupation',
+    'education',
+    'political_party',
+    'ethnicity_detail',
+    'ethnic_group',
+    'pets_affinity',
+    'health_affinity',
+    'diet_affinity',
+    'fitness_affinity',
+    'outdoors_affinity',
+    'boating_sailing_affinity',
+    'camping_hiking_climbing_affinity',
+    'fishing_affinity',
+    'hunting_affinity',
 ]
 
 
 # -- Dataframe Functions --
-@st.cache_data
-def load_csv(uploaded_file) -> pd.DataFrame:
-    """Load CSV file and return a DataFrame"""
-    df = pd.read_csv(uploaded_file)
-    return df
+def file_digest(uploaded_file: UploadedFile) -> str:
+    """Return a content hash of the uploaded file, stable across reruns and sessions (computed once per upload)"""
+    digests = st.session_state.setdefault("file_digests", {})
+    if uploaded_file.file_id not in digests:
+        digests[uploaded_file.file_id] = hashlib.blake2b(uploaded_file.getvalue(), digest_size=16).hexdigest()
+    return digests[uploaded_file.file_id]
+
+@st.cache_data(hash_funcs={UploadedFile: file_digest}) # key on the bytes, not the (per-rerun) file object
+def load_csv(uploaded_file: UploadedFile) -> pd.DataFrame:
+    """Load CSV file and return a DataFrame (Arrow-backed, so strings are stored compactly)"""
+    df = pd.read_csv(uploaded_file, engine="pyarrow", dtype_backend="pyarrow")
+    return downcast(df)
+
+def downcast(df: pd.DataFrame) -> pd.DataFrame:
+    """Convert the known low-cardinality columns to categorical dtype to cut memory"""
+    # entirely blank columns are read as null[pyarrow], which can't be made categorical (and have nothing to shrink)
+    columns = [col for col in CATEGORICAL_COLUMNS if col in df.columns and df[col].notna().any()]
+    return df.astype({col: "category" for col in columns})
 
-@st.cache_data
 def normalize_emails(df: pd.DataFrame) -> pd.DataFrame:
     """
     Normalize multiple emails per lead into a single 'email' field (from the email_1, email_2, email_3 columns) where 
@@ -113,26 +172,76 @@ def normalize_emails(df: pd.DataFrame) -> pd.DataFrame:
     If the user wants to exclude leads with no email address, it will be handled in the main app loop.
     """
     email_columns = ['email_1', 'email_2', 'email_3']
-    rows = []
 
-    for _, row in df.iterrows():
-        emails = []
-        for col in email_columns:
-            if pd.notna(row[col]):
-                emails.append(row[col].strip())
-        
-        # create new rows, drop original email columns
-        for email in emails:
-            new_row = row.drop(email_columns)
-            new_row['email'] = email
-            rows.append(new_row)
-        
-        # include leads with no email address
-        if not emails:
-            new_row = row.drop(email_columns)
-            new_row['email'] = None
-            rows.append(new_row)
-    return pd.DataFrame(rows)
+    # stack the email columns into one Series keyed by the lead's index (email_1, email_2, email_3 order per lead)
+    emails = df[email_columns].melt(value_name='email', ignore_index=False)['email'].dropna()
+    emails = emails.astype('string').str.strip()
+
+    # left join fans each lead out to one row per email, leads with no email address keep a single NaN email row
+    # (any 'email' column already in the upload is replaced)
+    return df.drop(columns=email_columns + ['email'], errors='ignore').join(emails, how='left').reset_index(drop=True)
+
+def evict_stale_cache() -> None:
+    """Delete cached uploads (and leftover temp files) older than CACHE_MAX_AGE"""
+    cutoff = time.time() - CACHE_MAX_AGE
+    for path in CACHE_DIR.glob("*"):
+        try:
+            if path.stat().st_mtime < cutoff:
+                path.unlink()
+        except OSError:
+            pass # already removed by another session/process
+
+@st.cache_resource(ttl=CACHE_MAX_AGE) # shared across sessions, the main loop only derives new frames from it (dropna, hoist_columns)
+def normalize_emails_cached(_df: pd.DataFrame, file_hash: str) -> pd.DataFrame:
+    """
+    normalize_emails, persisted to a Parquet file named after the upload's content hash so repeat uploads
+    of the same CSV skip the reshape, even after a server restart. Files are evicted after CACHE_MAX_AGE.
+    
+    _df is not hashed by Streamlit, file_hash identifies it.
+    """
+    evict_stale_cache()
+
+    path = CACHE_DIR / f"{file_hash}-v{CACHE_VERSION}.parquet"
+    if path.exists():
+        try:
+            cached = pd.read_parquet(path)
+            # Parquet doesn't round-trip every dtype (e.g. categoricals with integer categories come back as float64),
+            # so restore the upload's dtypes to match what a cache miss returns
+            return cached.astype({col: dtype for col, dtype in _df.dtypes.items() if col in cached.columns})
+        except Exception:
+            # unreadable (e.g. written by another pandas/pyarrow version), drop it and rebuild below
+            path.unlink(missing_ok=True)
+
+    df = normalize_emails(_df)
+    tmp_path = None
+    try:
+        # write to a unique temp file then rename, so concurrent sessions/processes never read a partial file
+        CACHE_DIR.mkdir(exist_ok=True)
+        with tempfile.NamedTemporaryFile(dir=CACHE_DIR, suffix=".tmp", delete=False) as tmp:
+            tmp_path = Path(tmp.name)
+        df.to_parquet(tmp_path, compression="zstd")
+        tmp_path.replace(path)
+    except Exception:
+        # the disk cache is best effort, just don't leave a partial file behind
+        if tmp_path is not None:
+            tmp_path.unlink(missing_ok=True)
+    return df
+
+def hoist_columns(df: pd.DataFrame, front: list[str]) -> pd.DataFrame:
+    """Move the given columns to the front, keeping the remaining columns in their current order"""
+    front_index = pd.Index(front)
+    return df.reindex(columns=front_index.append(df.columns.difference(front_index, sort=False)))
+
+def to_csv_bytes(df: pd.DataFrame) -> bytes:
+    """Serialize a DataFrame to UTF-8 CSV bytes with Arrow's multithreaded CSV writer"""
+    buf = io.BytesIO()
+    try:
+        pacsv.write_csv(pa.Table.from_pandas(df, preserve_index=False), buf)
+    except pa.ArrowException:
+        # columns Arrow can't convert (e.g. mixed-type object columns) fall back to pandas' writer
+        buf = io.BytesIO()
+        df.to_csv(buf, index=False, encoding="utf-8", chunksize=10_000)
+    return buf.getvalue()
 
 
 # -- Mailchimp Client Functions --
@@ -143,6 +252,17 @@ def get_mailchimp_client(api_key: str, server_prefix: str) -> Client:
     client.set_config({"api_key": api_key, "server": server_prefix})
     return client
 
+@st.cache_resource
+def get_http_session() -> requests.Session:
+    """Return a shared HTTP session, pooling connections and retrying throttled/unavailable requests"""
+    # only retry statuses where Mailchimp rejected the request before processing it, a batch resent after a
+    # 500/502/504 may already have been applied and would report its new members as "already a member" errors
+    # read errors aren't retried either, the connection may have dropped after the batch was applied
+    retry = Retry(total=3, read=False, backoff_factor=0.5, status_forcelist=[429, 503], allowed_methods=frozenset({"POST"}))
+    session = requests.Session()
+    session.mount("https://", HTTPAdapter(pool_connections=20, pool_maxsize=20, max_retries=retry))
+    return session
+
 @st.cache_data
 def verify_mailchimp_credentials(api_key: str, server_prefix: str) -> bool:
     """Verify the users Mailchimp API credentials"""
@@ -157,7 +277,7 @@ def verify_mailchimp_credentials(api_key: str, server_prefix: str) -> bool:
         st.error(f"An unexpected error occurred: {e}")
         return False
     
-@st.cache_data
+@st.cache_data(ttl=300)
 def fetch_mailchimp_lists(api_key: str, server_prefix: str) -> dict[str, Any]:
     return get_mailchimp_client(api_key, server_prefix).lists.get_all_lists()
 
@@ -168,85 +288,100 @@ def send_to_mailchimp(df: pd.DataFrame, api_key: str, server_prefix: str, list_i
     
     Note, this will not update leads that already exist (no way to tag them if upserted).
     This will only add new leads to the list.
+    Leads are sent in batches of up to MAILCHIMP_BATCH_SIZE members per API call, MAILCHIMP_MAX_WORKERS batches at a time.
     
     Returns the number of successful additions and a list of errors.
     """
-    def _safe_get(val: Any) -> str:
-        """temporary wrapper to handle NaN values"""
-        return "" if pd.isna(val) else val
-
-    def _clean_phone(phone: Any) -> str:
-        """Clean and format phone number to (###) ### - ####"""
-        
-        if pd.isna(phone):
-            return ""
-        
-        try:
-            phone = str(int(float(phone))).strip()
-            if len(phone) == 10:
-                return f"({phone[:3]}) {phone[3:6]} - {phone[6:]}"
-            return ""
-        except Exception as e:
-            return ""
+    def _clean_phones(phones: pd.Series) -> pd.Series:
+        """Clean and format phone numbers to (###) ### - ####, blank if not a 10 digit number"""
+        numbers = pd.to_numeric(phones, errors="coerce")
+        # blank anything that isn't a 10 digit number before the integer cast, which can't hold oversized values
+        numbers = numbers.where(numbers.between(1e9, 1e10 - 1))
+        digits = numbers.floordiv(1).astype("Int64").astype("string")
+        formatted = "(" + digits.str[:3] + ") " + digits.str[3:6] + " - " + digits.str[6:]
+        return formatted.fillna("")
         
     successes: int = 0
     errors: list[Tuple[str, str]] = []
 
-    for _, row in df.iterrows():
+    # leads without an email can't be added, so drop them before building any payloads
+    df = df[df["email"].astype("string").fillna("").ne("")]
+
+    raw_phones = df["phone_1"] if "phone_1" in df.columns else pd.Series(pd.NA, index=df.index)
+    df = df.assign(phone_formatted=_clean_phones(raw_phones))
+
+    # only the columns the API needs, with NaN/missing columns blanked out
+    send_columns = ["email", "first_name", "last_name", "phone_formatted", "birth_month_and_year", "address", "city", "state", "zip_code", "tags"]
+    sub = df.reindex(columns=send_columns).astype("string").fillna("")
+    # comma separated tags -> list of stripped, non-empty tags (a missing tags column is blank, so no tags)
+    sub["tags_list"] = [[tag.strip() for tag in tags if tag.strip()] for tags in sub["tags"].str.split(",")]
+
+    # merge field dicts for every lead in one conversion each, keyed by Mailchimp's field names
+    merge_fields = (
+        sub[["first_name", "last_name", "phone_formatted", "birth_month_and_year"]]
+        .set_axis(["FNAME", "LNAME", "PHONE", "BIRTHDAY"], axis=1)
+        .to_dict(orient="records")
+    )
+    addresses = (
+        sub[["address", "city", "state", "zip_code"]]
+        .set_axis(["addr1", "city", "state", "zip"], axis=1)
+        .assign(country="USA")
+        .to_dict(orient="records")
+    )
+
+    def _build_member(email: str, fields: dict[str, str], address: dict[str, str], tags: list[str]) -> dict[str, Any]:
+        """Build the batch subscribe payload for a single lead"""
+        fields["ADDRESS"] = address
+        member = {
+            "email_address": email,
+            "status": status,
+            "merge_fields": fields,
+        }
+        if tags:
+            member["tags"] = tags
+        return member
+
+    url = f"https://{server_prefix}.api.mailchimp.com/3.0/lists/{list_id}"
+    headers = {
+        "Authorization": "Basic " + base64.b64encode(f"anystring:{api_key}".encode()).decode(),
+    }
+
+    def _send_batch(batch: list[dict[str, Any]]) -> Tuple[int, list[Tuple[str, str]]]:
+        """Submit one batch of members, returning its number of additions and errors"""
         try:
-            email = row.get("email")
-            if not email:
-                continue
-
-            merge_fields = {
-                "FNAME": _safe_get(row.get("first_name", "")),
-                "LNAME": _safe_get(row.get("last_name", "")),
-                "PHONE": _clean_phone(row.get("phone_1", "")),
-                "BIRTHDAY": _safe_get(row.get("birth_month_and_year", "")),
-                "ADDRESS": {
-                    "addr1": _safe_get(row.get("address", "")),
-                    "city": _safe_get(row.get("city", "")),
-                    "state": _safe_get(row.get("state", "")),
-                    "zip": str(_safe_get(row.get("zip_code", ""))),
-                    "country": "USA",
-                }
-            }
-                        
-            payload = {
-                "email_address": email,
-                "status": status,
-                "merge_fields": merge_fields,
-            }
-                                    
-            if "tags" in df.columns:
-                raw_tags = _safe_get(row.get("tags", ""))
-                raw_tags = raw_tags.split(",") if isinstance(raw_tags, str) else []
-                if raw_tags:
-                    payload["tags"] = [tag.strip() for tag in raw_tags if tag.strip()]
-
-            url = f"https://{server_prefix}.api.mailchimp.com/3.0/lists/{list_id}/members"
-            headers = {
-                "Content-Type": "application/json",
-                "Authorization": "Basic " + base64.b64encode(f"anystring:{api_key}".encode()).decode(),
-            }
-
-            response = requests.post(url, headers=headers, data=json.dumps(payload))
-
+            response = session.post(url, headers=headers, json={"members": batch, "update_existing": False}, timeout=MAILCHIMP_TIMEOUT)
             if response.status_code >= 400:
-                errors.append((email, response.text))
-            else:
-                successes += 1
+                return 0, [(member["email_address"], response.text) for member in batch]
 
+            result = response.json()
+            return len(result["new_members"]), [(error["email_address"], error["error"]) for error in result["errors"]]
         except Exception as e:
-            errors.append((email, str(e)))
+            return 0, [(member["email_address"], str(e)) for member in batch]
+
+    session = get_http_session()
+    members = iter([_build_member(*lead) for lead in zip(sub["email"], merge_fields, addresses, sub["tags_list"])])
+    batches = iter(lambda: list(islice(members, MAILCHIMP_BATCH_SIZE)), [])
+
+    # batches are independent HTTP calls, so overlap their network latency
+    with ThreadPoolExecutor(max_workers=MAILCHIMP_MAX_WORKERS) as executor:
+        for batch_successes, batch_errors in executor.map(_send_batch, batches):
+            successes += batch_successes
+            errors.extend(batch_errors)
     
     return successes, errors
 
 
 # -- Tagging Functions --
-@st.cache_data
-def tag_leads(df: pd.DataFrame, tag_mapping: dict[str, list[str]], tagger_cls: BaseTagger = StandardTagger, priority_list: list[str] | None = None) -> pd.DataFrame:
-    tagger = tagger_cls(df, tag_mapping, priority_list)
+@st.cache_resource
+def tag_leads(_df: pd.DataFrame, df_key: str, tag_mapping: dict[str, list[str]], tagger_cls: BaseTagger = StandardTagger, priority_list: list[str] | None = None) -> pd.DataFrame:
+    """
+    Tag leads with the given tagger.
+    
+    _df is not hashed by Streamlit (re-hashing it on every widget edit is slow), df_key must identify its contents.
+    Cached with cache_resource rather than cache_data, since the result is only read (its tags column is copied
+    onto the full frame), so pickling it on every cache hit would be wasted work.
+    """
+    tagger = tagger_cls(_df, tag_mapping, priority_list)
     return tagger.apply_tags()
 
 
@@ -282,28 +417,30 @@ if uploaded_file:
     required_columns = ["email_1", "email_2", "email_3", "first_name", "last_name"] # minimum required columns
     missing_columns = [col for col in required_columns if col not in df.columns]
     
-    if not all(col in df.columns for col in required_columns):
+    if missing_columns:
         st.error(f"CSV file must contain the following columns: {', '.join(required_columns)}. Currently missing: {', '.join(missing_columns)}")
         st.stop()
     
-    df = normalize_emails(df)
+    file_hash = file_digest(uploaded_file)
+    df = normalize_emails_cached(df, file_hash)
     
     include_no_email = st.checkbox("Include leads with no email address", value=True)
     
     if not include_no_email:
         df = df.dropna(subset=["email"])
 
-    # hoist email, name to first columns
-    df = df[["email", "first_name", "last_name"] + [col for col in df.columns if col not in ["email", "first_name", "last_name"]]]
-
     user_choice = st.radio("What would you like to do?", ["Download CSV file", "Send to Mailchimp"])
 
     if user_choice == "Download CSV file":
+        # hoist email, name to first columns (only needed for display/download, the tagging path reorders its own output)
+        df = hoist_columns(df, ["email", "first_name", "last_name"])
+
         st.subheader("Mailchimp Compatible CSV")
-        st.write(df)
+        st.dataframe(df.head(PREVIEW_ROWS))
+        st.caption(f"Showing the first {min(PREVIEW_ROWS, len(df))} of {len(df)} rows.")
         st.write("This CSV contains one row per email address, for uploading to Mailchimp.")
 
-        csv = df.to_csv(index=False).encode('utf-8')
+        csv = to_csv_bytes(df)
         st.download_button("Download CSV file", csv, "real-intent-mailchimp-leads.csv", "text/csv")
     
     elif user_choice == "Send to Mailchimp" and mailchimp_ready:
@@ -321,22 +458,35 @@ if uploaded_file:
             Separate multiple tags with commas. For example: Buyer, Seller, Investor, etc...
         """)
         
-        intent_columns = [col for col in df.columns if col not in default_columns]
+        intent_columns = [col for col in df.columns if col not in DEFAULT_COLUMNS]
+
+        # one editable table for all intent columns, instead of a text input (and rerun) per column
+        mapping_df = pd.DataFrame({"intent": intent_columns, "tags": ""})
+        edited_mapping = st.data_editor(
+            mapping_df,
+            column_config={"intent": "Intent column", "tags": "Mailchimp tag(s)"},
+            disabled=["intent"],
+            hide_index=True,
+            num_rows="fixed",
+            key="tag_map",
+        )
 
-        tag_mapping: dict[str, list[str]] = {}
-        
-        for col in intent_columns:
-            tags_input = st.text_input(f"Map '{col}' intent column to a Mailchimp tag(s)")
-            if tags_input:
-                tags_list = [tag.strip() for tag in tags_input.split(",")]
-                tag_mapping[col] = tags_list
+        tag_mapping: dict[str, list[str]] = {
+            row.intent: [tag.strip() for tag in row.tags.split(",")]
+            for row in edited_mapping.itertuples(index=False)
+            if row.tags
+        }
         
         tagging_options = st.radio("Tagging Options", ["Standard Tagger", "Custom Tagger #1"], index=0)
         
         st.write(f"{tagging_options}: {BaseTagger.get_description(tagging_options)}")
+
+        # taggers only read the mapped intent columns, the upload + email filter identify the rows
+        tagger_input = df[list(tag_mapping)]
+        tagger_key = f"{file_hash}:{include_no_email}"
                 
         if tagging_options == "Standard Tagger":
-            tagged_df = tag_leads(df, tag_mapping, StandardTagger)
+            lead_tags = tag_leads(tagger_input, tagger_key, tag_mapping, StandardTagger)["tags"]
         elif tagging_options == "Custom Tagger #1":
             
             # Grab unique tags
@@ -352,17 +502,20 @@ if uploaded_file:
                 st.warning("Please input at least one mapping to continue.")
                 st.stop()
             
-            tagged_df = tag_leads(df, tag_mapping, Custom_1_Tagger, sorted_priority)
+            lead_tags = tag_leads(tagger_input, tagger_key, tag_mapping, Custom_1_Tagger, sorted_priority)["tags"]
 
+        # tagger output keeps the input's index, so tags line up with the full frame row for row
+        tagged_df = df.assign(tags=lead_tags)
 
         # hoist email, tags, name to first columns
-        tagged_df = tagged_df[["email", "tags", "first_name", "last_name"] + [col for col in tagged_df.columns if col not in ["email", "tags", "first_name", "last_name"]]]
+        tagged_df = hoist_columns(tagged_df, ["email", "tags", "first_name", "last_name"])
 
         st.subheader("Tagged Leads")
-        st.write(tagged_df)
+        st.dataframe(tagged_df.head(PREVIEW_ROWS))
+        st.caption(f"Showing the first {min(PREVIEW_ROWS, len(tagged_df))} of {len(tagged_df)} rows.")
         
         st.write("This CSV contains one row per email address, with tags assigned based on the categories you mapped. Note uploading this to Mailchimp will NOT add these tags to the leads. However, you can still choose to download this CSV.")
-        csv_categorized = tagged_df.to_csv(index=False).encode('utf-8')
+        csv_categorized = to_csv_bytes(tagged_df)
         st.download_button("Download CSV", csv_categorized, "real-intent-mailchimp-leads-tagged.csv", "text/csv")
 
         st.subheader("Subscription Status")
@@ -0,0 +1 @@
+# makes the repo root importable from tests/ (e.g. `import app`)
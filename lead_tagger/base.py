@@ -1,20 +1,39 @@
 from abc import ABC, abstractmethod
+import numpy as np
 import pandas as pd
 
 class BaseTagger(ABC):
     def __init__(self, df: pd.DataFrame, tag_mapping: dict[str, list[str]], priority_list: list[str] = None):
-        self.df = df.copy()
+        self.df = df
         self.tag_mapping = tag_mapping
         self.priority_list = priority_list if priority_list else []
 
     def apply_tags(self) -> pd.DataFrame:
-        self.df["tags"] = self.df.apply(self.generate_tags, axis=1)
-        return self.df
+        """Return a new DataFrame with a 'tags' column added, the input DataFrame is left untouched"""
+        if not self.tag_mapping:
+            return self.df.assign(tags='')
+        return self.df.assign(tags=self.generate_tags())
 
     @abstractmethod
-    def generate_tags(self, row: pd.Series) ->str:
-        """Return a string of comma separated tags based on the row's intent columns"""
+    def generate_tags(self) -> pd.Series:
+        """Return a Series with a string of comma separated tags for each row, based on the row's intent columns"""
         pass
+
+    def tag_matrix(self, tags: list[str]) -> np.ndarray:
+        """
+        Return an (n_rows x n_tags) boolean matrix, True where a row has an intent column mapped to that tag.
+        Mapped tags not in `tags` are ignored.
+        """
+        intent_columns = list(self.tag_mapping)
+        has_intent = self.df.reindex(columns=intent_columns).notna().to_numpy(dtype=bool)
+
+        tag_index = {tag: i for i, tag in enumerate(tags)}
+        matrix = np.zeros((len(self.df), len(tags)), dtype=bool)
+        for col_idx, tags_list in enumerate(self.tag_mapping.values()):
+            for tag in tags_list:
+                if tag in tag_index:
+                    matrix[:, tag_index[tag]] |= has_intent[:, col_idx]
+        return matrix
     
     @staticmethod
     def get_description(tagger_type: str) -> str:
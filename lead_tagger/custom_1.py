@@ -1,15 +1,17 @@
 """ Custom Tagger for Jason, with custom logic that ensures only 1 tag per lead, and custom priority if multiple intents are detected. """
 from .base import BaseTagger
+import numpy as np
 import pandas as pd
 
 class Custom_1_Tagger(BaseTagger):
-    def generate_tags(self, row: pd.Series) -> str:
-        tags: set = set()
+    def generate_tags(self) -> pd.Series:
+        mapped_tags = {tag for tags_list in self.tag_mapping.values() for tag in tags_list}
+        tags = [tag for tag in self.priority_list if tag in mapped_tags]
+        if not tags:
+            return pd.Series('', index=self.df.index, dtype=object)
 
-        for col, tags_list in self.tag_mapping.items():
-            if pd.notna(row.get(col)):
-                tags.update(tags_list)
+        # columns are in priority order, so the first True in each row is its highest priority tag
+        matrix = self.tag_matrix(tags)
+        first_idx = matrix.argmax(axis=1)
 
-        sorted_tags = sorted(tags, key=lambda x: self.priority_list.index(x))
-
-        return sorted_tags[0] if sorted_tags else ''
+        return pd.Series(np.where(matrix.any(axis=1), np.array(tags, dtype=object)[first_idx], ''), index=self.df.index)
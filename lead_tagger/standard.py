@@ -1,12 +1,10 @@
 from .base import BaseTagger
+from itertools import compress
 import pandas as pd
 
 class StandardTagger(BaseTagger):
-    def generate_tags(self, row: pd.Series) -> str:
-        tags: set = set()
+    def generate_tags(self) -> pd.Series:
+        tags = sorted({tag for tags_list in self.tag_mapping.values() for tag in tags_list})
+        matrix = self.tag_matrix(tags)
 
-        for col, tags_list in self.tag_mapping.items():
-            if pd.notna(row.get(col)):
-                tags.update(tags_list)
-
-        return ', '.join(sorted(tags))
+        return pd.Series([', '.join(compress(tags, row)) for row in matrix], index=self.df.index, dtype=object)
@@ -0,0 +1,159 @@
+import io
+
+import pandas as pd
+
+import app
+
+
+def read_upload(csv: str) -> pd.DataFrame:
+    """Read a CSV the same way load_csv does, without the Streamlit cache"""
+    return app.downcast(pd.read_csv(io.BytesIO(csv.encode()), engine="pyarrow", dtype_backend="pyarrow"))
+
+
+def test_downcast_skips_all_blank_categorical_column():
+    df = read_upload("first_name,state,gender\na,CA,\nb,NY,\n")
+
+    assert isinstance(df["state"].dtype, pd.CategoricalDtype)
+    assert df["gender"].isna().all()
+
+
+def test_downcast_handles_sparse_affinity_columns():
+    df = read_upload("first_name,pets_affinity,fishing_affinity,hunting_affinity\na,3,,\nb,,,\nc,5,,\n")
+
+    assert isinstance(df["pets_affinity"].dtype, pd.CategoricalDtype)
+    assert df["fishing_affinity"].isna().all()
+    assert df["hunting_affinity"].isna().all()
+
+
+class FakeResponse:
+    def __init__(self, status_code: int, body: dict):
+        self.status_code = status_code
+        self.body = body
+        self.text = str(body)
+
+    def json(self) -> dict:
+        return self.body
+
+
+class FakeSession:
+    """Replies to every POST with the same response, recording the members sent"""
+    def __init__(self, response: FakeResponse = None):
+        self.response = response or FakeResponse(200, {"new_members": [], "errors": []})
+        self.sent = []
+
+    def post(self, url, headers=None, json=None, timeout=None):
+        self.sent.extend(json["members"])
+        return self.response
+
+
+def send_leads(monkeypatch, session: FakeSession, df: pd.DataFrame):
+    monkeypatch.setattr(app, "get_http_session", lambda: session)
+    return app.send_to_mailchimp(df, "key", "us1", "list", "subscribed")
+
+
+LEADS = pd.DataFrame({
+    "email": ["a@example.com", None, "b@example.com"],
+    "first_name": ["A", "B", "C"],
+    "last_name": ["X", "Y", "Z"],
+    "phone_1": [5551234567, None, 5559876543],
+    "tags": ["Buyer, Seller", None, ""],
+})
+
+
+def test_send_to_mailchimp_counts_batch_results(monkeypatch):
+    response = FakeResponse(200, {
+        "new_members": [{"email_address": "a@example.com"}],
+        "errors": [{"email_address": "b@example.com", "error": "already a member"}],
+    })
+
+    assert send_leads(monkeypatch, FakeSession(response), LEADS) == (1, [("b@example.com", "already a member")])
+
+
+def test_send_to_mailchimp_errors_batch_on_unexpected_response(monkeypatch):
+    successes, errors = send_leads(monkeypatch, FakeSession(FakeResponse(200, {})), LEADS)
+
+    assert successes == 0
+    assert [email for email, _ in errors] == ["a@example.com", "b@example.com"]
+
+
+def test_send_to_mailchimp_blanks_invalid_phones(monkeypatch):
+    df = read_upload(
+        "email,first_name,last_name,phone_1\n"
+        "a@example.com,A,X,5551234567\n"
+        "b@example.com,B,Y,99999999999999999999\n"
+        "c@example.com,C,Z,123\n"
+    )
+    session = FakeSession()
+    send_leads(monkeypatch, session, df)
+
+    assert [member["merge_fields"]["PHONE"] for member in session.sent] == ["(555) 123 - 4567", "", ""]
+
+
+def test_normalize_emails_fans_out_one_row_per_email():
+    df = read_upload(
+        "first_name,last_name,email_1,email_2,email_3\n"
+        "a,x, a1@example.com ,a2@example.com,a3@example.com\n"
+        "b,y,,,\n"
+        "c,z,,c2@example.com,\n"
+    )
+
+    normalized = app.normalize_emails(df)
+
+    assert normalized["first_name"].tolist() == ["a", "a", "a", "b", "c"]
+    assert normalized["email"].tolist()[:3] == ["a1@example.com", "a2@example.com", "a3@example.com"]
+    assert normalized["email"].isna().tolist() == [False, False, False, True, False]
+    assert normalized.loc[4, "email"] == "c2@example.com"
+    assert not {"email_1", "email_2", "email_3"} & set(normalized.columns)
+
+
+def test_normalize_emails_replaces_existing_email_column():
+    df = read_upload("first_name,last_name,email,email_1,email_2,email_3\na,x,old@example.com,new@example.com,,\n")
+
+    normalized = app.normalize_emails(df)
+
+    assert normalized["email"].tolist() == ["new@example.com"]
+
+
+def test_normalize_emails_cached_hit_matches_miss(monkeypatch, tmp_path):
+    monkeypatch.setattr(app, "CACHE_DIR", tmp_path)
+    df = read_upload(
+        "first_name,last_name,email_1,email_2,email_3,pets_affinity,state\n"
+        "a,x,a1@example.com,a2@example.com,,3,CA\n"
+        "b,y,,,,,\n"
+        "c,z,c1@example.com,,,5,NY\n"
+    )
+
+    app.normalize_emails_cached.clear()
+    miss = app.normalize_emails_cached(df, "upload")
+    app.normalize_emails_cached.clear()
+    hit = app.normalize_emails_cached(df, "upload")
+
+    assert [path.name for path in tmp_path.iterdir()] == [f"upload-v{app.CACHE_VERSION}.parquet"]
+    pd.testing.assert_frame_equal(hit, miss)
+
+
+def test_normalize_emails_cached_rebuilds_unreadable_file(monkeypatch, tmp_path):
+    monkeypatch.setattr(app, "CACHE_DIR", tmp_path)
+    df = read_upload("first_name,last_name,email_1,email_2,email_3\na,x,a1@example.com,,\n")
+    path = tmp_path / f"upload-v{app.CACHE_VERSION}.parquet"
+    path.write_bytes(b"not parquet")
+
+    app.normalize_emails_cached.clear()
+    result = app.normalize_emails_cached(df, "upload")
+
+    pd.testing.assert_frame_equal(result, app.normalize_emails(df))
+    app.normalize_emails_cached.clear()
+    pd.testing.assert_frame_equal(app.normalize_emails_cached(df, "upload"), result)
+
+
+def test_send_to_mailchimp_strips_and_drops_empty_tags(monkeypatch):
+    df = pd.DataFrame({
+        "email": ["a@example.com", "b@example.com", "c@example.com"],
+        "first_name": ["A", "B", "C"],
+        "last_name": ["X", "Y", "Z"],
+        "tags": [" Buyer ,Real Estate, ", None, ", ,"],
+    })
+    session = FakeSession()
+    send_leads(monkeypatch, session, df)
+
+    assert [member.get("tags") for member in session.sent] == [["Buyer", "Real Estate"], None, None]
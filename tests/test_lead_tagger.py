@@ -0,0 +1,65 @@
+import pandas as pd
+
+from lead_tagger import StandardTagger, Custom_1_Tagger
+
+
+LEADS = pd.DataFrame(
+    {
+        "buyer_intent": ["x", None, "x", None],
+        "seller_intent": ["x", None, None, "x"],
+        "investor_intent": ["x", None, "x", None],
+    },
+    index=[10, 20, 30, 40],
+)
+
+TAG_MAPPING = {
+    "seller_intent": ["Seller"],
+    "buyer_intent": ["Buyer", "Investor"],
+    "investor_intent": ["Investor"],
+}
+
+
+def test_standard_tagger_joins_sorted_unique_tags():
+    tags = StandardTagger(LEADS, TAG_MAPPING).apply_tags()["tags"]
+
+    assert tags.tolist() == ["Buyer, Investor, Seller", "", "Buyer, Investor", "Seller"]
+
+
+def test_standard_tagger_ignores_mapped_column_missing_from_frame():
+    tags = StandardTagger(LEADS, {**TAG_MAPPING, "renter_intent": ["Renter"]}).apply_tags()["tags"]
+
+    assert tags.tolist() == ["Buyer, Investor, Seller", "", "Buyer, Investor", "Seller"]
+
+
+def test_standard_tagger_blank_for_rows_without_intent():
+    leads = LEADS.assign(buyer_intent=None, seller_intent=None, investor_intent=None)
+
+    assert StandardTagger(leads, TAG_MAPPING).apply_tags()["tags"].tolist() == ["", "", "", ""]
+
+
+def test_tagger_keeps_input_index():
+    tagged = StandardTagger(LEADS, TAG_MAPPING).apply_tags()
+
+    assert tagged.index.tolist() == [10, 20, 30, 40]
+    assert tagged.loc[40, "tags"] == "Seller"
+    assert "tags" not in LEADS.columns
+
+
+def test_tagger_with_empty_mapping_returns_blank_tags():
+    for tagger_cls in (StandardTagger, Custom_1_Tagger):
+        tagged = tagger_cls(LEADS, {}).apply_tags()
+
+        assert tagged["tags"].tolist() == ["", "", "", ""]
+        assert tagged.index.equals(LEADS.index)
+
+
+def test_custom_1_tagger_picks_highest_priority_tag():
+    tags = Custom_1_Tagger(LEADS, TAG_MAPPING, ["Seller", "Investor", "Buyer"]).apply_tags()["tags"]
+
+    assert tags.tolist() == ["Seller", "", "Investor", "Seller"]
+
+
+def test_custom_1_tagger_ignores_tags_missing_from_priority_list():
+    tags = Custom_1_Tagger(LEADS, TAG_MAPPING, ["Buyer"]).apply_tags()["tags"]
+
+    assert tags.tolist() == ["Buyer", "", "Buyer", ""]